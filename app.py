@@ -1,9 +1,17 @@
+import hmac
 import json
+import mmap
 import os
 import random
+import tempfile
+import threading
+import zipfile
+from collections import namedtuple
+from contextlib import contextmanager
 from datetime import datetime
+from stat import S_IMODE
+from xml.sax.saxutils import escape as xml_escape
 
-import pandas as pd
 from flask import (
     Flask,
     abort,
@@ -12,59 +20,390 @@ from flask import (
     redirect,
     render_template,
     request,
-    send_file,
+    send_from_directory,
     url_for,
 )
 
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory file locks.
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:  # Optional speedup; fall back to the stdlib parser.
+    orjson = None
+
 app = Flask(__name__)
 app.secret_key = "clave-super-secreta"
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 PARTICIPANTS_FILE = os.path.join(DATA_DIR, "participantes.json")
-ASSIGNMENTS_FILE = os.path.join(DATA_DIR, "asignaciones.json")
+ASSIGNMENTS_FILE = os.path.join(DATA_DIR, "asignaciones.jsonl")
+ASSIGNMENTS_LOCK_FILE = ASSIGNMENTS_FILE + ".lock"
+LEGACY_ASSIGNMENTS_FILE = os.path.join(DATA_DIR, "asignaciones.json")
 EXCEL_FILE = os.path.join(DATA_DIR, "asignaciones.xlsx")
+# Identity (inode, size, mtime) of the assignments file the export was built from.
+EXCEL_STAMP_FILE = EXCEL_FILE + ".stamp"
+EXCEL_LOCK_FILE = EXCEL_FILE + ".lock"
+EXCEL_COLUMNS = ("FechaHora", "Nombre", "Pareja")
+# Stored assignments use partner=None when nobody was left to assign.
+NO_PARTNER_LABEL = "SIN PAREJA (no hay más participantes disponibles)"
+# "xml" writes the workbook parts by hand; "openpyxl" keeps the library path.
+EXCEL_ENGINE = os.environ.get("EXCEL_ENGINE", "xml")
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "12345679")
+_ADMIN_PASSWORD_BYTES = ADMIN_PASSWORD.encode("utf-8")
+
+# Files at least this big are parsed straight from an mmap (orjson only).
+MMAP_MIN_BYTES = 64 * 1024
+
+# Parsed file contents keyed by the file's st_mtime_ns so each file is only
+# re-read when it changes on disk.
+_PARTICIPANTS = {"list": None, "set": None, "mtime": 0}
+_assignments_cache = {
+    "mtime": None,
+    "key": None,
+    "fd": None,
+    "offset": 0,
+    "data": None,
+    "generation": 0,  # Bumped on every full reload.
+}
+# Keep an fd open on the parsed assignments file (needs os.pread, i.e. POSIX).
+_PIN_ASSIGNMENTS_FILE = hasattr(os, "pread")
+# Values derived from both files, keyed by their versions (see load_assignment_state).
+_derived_cache = {"version": None, "state": None}
+_cache_lock = threading.Lock()
+# Read once at import (still single-threaded); os.umask can only be read by setting it.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _json_loads(data):
+    """Parse JSON from bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps_line(obj):
+    """Serialize obj as one UTF-8 JSON line (bytes, newline-terminated)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _read_json_file(path, size):
+    """Parse a JSON file, mapping it into memory when it is large enough."""
+    with open(path, "rb") as file:
+        if orjson is None or size < MMAP_MIN_BYTES:
+            # mmap setup costs more than a plain read for small files, and the
+            # stdlib parser cannot read from a memoryview anyway.
+            return _json_loads(file.read())
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                return orjson.loads(view)
+
+
+def _refresh_participants(stat=None):
+    """Reload _PARTICIPANTS from participantes.json; hold _cache_lock."""
+    if stat is None:
+        stat = os.stat(PARTICIPANTS_FILE)
+    names = _read_json_file(PARTICIPANTS_FILE, stat.st_size).get("names", [])
+    _PARTICIPANTS["list"] = names
+    _PARTICIPANTS["set"] = frozenset(names)
+    _PARTICIPANTS["mtime"] = stat.st_mtime_ns
+
+
+def _maybe_refresh_participants():
+    """Reload participants only if the file changed; costs one stat call."""
+    with _cache_lock:
+        stat = os.stat(PARTICIPANTS_FILE)
+        if stat.st_mtime_ns != _PARTICIPANTS["mtime"]:
+            _refresh_participants(stat)
+        return _PARTICIPANTS["list"], _PARTICIPANTS["set"], _PARTICIPANTS["mtime"]
 
 
 def load_participants():
     """Return the list of participant names from participantes.json."""
-    with open(PARTICIPANTS_FILE, "r", encoding="utf-8") as file:
-        data = json.load(file)
-    return data.get("names", [])
+    return _maybe_refresh_participants()[0]
 
 
-def load_assignments():
-    """Load assignments ensuring the JSON file exists."""
-    if not os.path.exists(ASSIGNMENTS_FILE):
-        save_assignments([])
+# The participant list is effectively static: load it once at import time.
+with _cache_lock:
+    _refresh_participants()
+
+
+@contextmanager
+def _atomic_write(path):
+    """Yield a binary temp file next to path that replaces path once closed."""
+    tmp = tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(path), suffix=".tmp", delete=False
+    )
+    try:
+        with tmp:
+            yield tmp
+        # NamedTemporaryFile is created 0600; keep the mode readers expect.
+        try:
+            mode = S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_UMASK
+        os.chmod(tmp.name, mode)
+        os.replace(tmp.name, path)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+
+
+@contextmanager
+def _file_lock(lock_path):
+    """Hold an exclusive flock on lock_path, serializing across processes."""
+    if fcntl is None:
+        # No flock on this platform; the single dev server process is fine.
+        yield
+        return
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _assignments_file_lock():
+    """Serialize read-modify-write cycles on the assignments across processes."""
+    return _file_lock(ASSIGNMENTS_LOCK_FILE)
+
+
+def _load_legacy_assignments():
+    """Return the assignments stored in the old asignaciones.json, if any."""
+    if not os.path.exists(LEGACY_ASSIGNMENTS_FILE):
         return []
+    with open(LEGACY_ASSIGNMENTS_FILE, "rb") as file:
+        data = _json_loads(file.read())
+    # Migrated records go through the same partner normalization as JSONL lines.
+    return [_normalize_assignment(item) for item in data.get("assignments", [])]
+
+
+def _normalize_assignment(item):
+    """Turn an old "SIN PAREJA ..." partner string into the None sentinel."""
+    partner = item.get("partner")
+    if not partner or partner.startswith("SIN PAREJA"):
+        item["partner"] = None
+    return item
+
+
+def _partner_label(item):
+    """Return the partner name to display, or the no-partner label."""
+    partner = item.get("partner")
+    return NO_PARTNER_LABEL if partner is None else partner
+
 
-    with open(ASSIGNMENTS_FILE, "r", encoding="utf-8") as file:
-        data = json.load(file)
-    return data.get("assignments", [])
+def _parse_assignment_lines(chunk):
+    """Parse a bytes chunk of complete JSONL lines into assignment dicts."""
+    return [
+        _normalize_assignment(_json_loads(line))
+        for line in chunk.splitlines()
+        if line.strip()
+    ]
+
+
+def _refresh_assignments_cache():
+    """Bring _assignments_cache up to date with the file; hold _cache_lock."""
+    cache = _assignments_cache
+    stat = os.stat(ASSIGNMENTS_FILE)
+    fd = cache["fd"]
+    # The cached fd keeps the parsed file's inode alive, so a replacement can
+    # never reuse that inode number: a match really is the same file.
+    same_file = fd is not None and os.path.samestat(os.fstat(fd), stat)
+    if same_file and cache["mtime"] == stat.st_mtime_ns and cache["offset"] == stat.st_size:
+        return cache
+    if not _PIN_ASSIGNMENTS_FILE and cache["key"] == (
+        stat.st_ino, stat.st_size, stat.st_mtime_ns
+    ):
+        # No pinned fd to compare against; an unchanged identity means no reload.
+        return cache
+
+    if not same_file or stat.st_size < cache["offset"]:
+        if fd is not None:
+            os.close(fd)
+        fd = cache["fd"] = os.open(ASSIGNMENTS_FILE, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        stat = os.fstat(fd)
+        cache["data"] = []
+        cache["offset"] = 0
+        # Derived data must be rebuilt even if size and mtime happen to match.
+        cache["generation"] += 1
+    # The file only grows between compactions, so only parse what was appended.
+    if _PIN_ASSIGNMENTS_FILE:
+        # pread leaves the shared file position alone for forked workers.
+        chunk = os.pread(fd, stat.st_size - cache["offset"], cache["offset"])
+    else:
+        os.lseek(fd, cache["offset"], os.SEEK_SET)
+        chunk = os.read(fd, stat.st_size - cache["offset"])
+    complete = chunk.rfind(b"\n") + 1
+    records = _parse_assignment_lines(chunk[:complete])
+    tail = chunk[complete:]
+    if tail.strip():
+        # A last line without "\n" is kept if it is already a whole record
+        # (hand edit, torn newline); otherwise it may still be in flight.
+        try:
+            records.append(_normalize_assignment(_json_loads(tail)))
+            complete = len(chunk)
+        except ValueError:
+            pass
+    cache["data"].extend(records)
+    cache["offset"] += complete
+    cache["mtime"] = stat.st_mtime_ns
+    cache["key"] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    if not _PIN_ASSIGNMENTS_FILE:
+        # Windows cannot replace a file that is held open; reload fully next time.
+        os.close(fd)
+        cache["fd"] = None
+    return cache
+
+
+def load_assignments(copy=True):
+    """Load assignments ensuring the JSONL file exists.
+
+    Read-only callers can pass copy=False to skip copying every record.
+    """
+    if not os.path.exists(ASSIGNMENTS_FILE):
+        # First run on the JSONL format: migrate the old JSON file once.
+        save_assignments(_load_legacy_assignments())
+
+    with _cache_lock:
+        data = _refresh_assignments_cache()["data"]
+        if not copy:
+            return list(data)
+        # Callers mutate the list they get back, so hand out a copy.
+        return [dict(item) for item in data]
+
+
+def _last_byte(path):
+    """Return the final byte of a non-empty file."""
+    with open(path, "rb") as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1)
+
+
+def append_assignment(assignment):
+    """Append a single assignment record to asignaciones.jsonl."""
+    with _cache_lock:
+        with open(ASSIGNMENTS_FILE, "ab") as file:
+            # Never glue a record onto a last line that lacks its newline.
+            if file.tell() and _last_byte(ASSIGNMENTS_FILE) != b"\n":
+                file.write(b"\n")
+            file.write(_json_dumps_line(assignment))
+        # The mtime may not move within the filesystem's timestamp tick.
+        _assignments_cache["mtime"] = None
+        _assignments_cache["key"] = None
+        _derived_cache["version"] = None
 
 
 def save_assignments(assignments_list):
-    """Persist the assignments list to asignaciones.json."""
-    payload = {"assignments": assignments_list}
-    with open(ASSIGNMENTS_FILE, "w", encoding="utf-8") as file:
-        json.dump(payload, file, ensure_ascii=False, indent=2)
+    """Rewrite asignaciones.jsonl with the full list (compaction)."""
+    with _cache_lock:
+        with _atomic_write(ASSIGNMENTS_FILE) as file:
+            file.write(b"".join(_json_dumps_line(item) for item in assignments_list))
+        # Drop the pinned old file; the next load reads the new one from scratch.
+        if _assignments_cache["fd"] is not None:
+            os.close(_assignments_cache["fd"])
+        _assignments_cache["fd"] = None
+        _assignments_cache["mtime"] = None
+        _assignments_cache["key"] = None
+        _derived_cache["version"] = None
+
+
+_XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Asignaciones" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        "</styleSheet>"
+    ),
+}
+_XLSX_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    "<sheetData>"
+)
+_XLSX_SHEET_FOOTER = "</sheetData></worksheet>"
+_XLSX_ROWS_PER_WRITE = 256
+
+
+AssignmentIndex = namedtuple("AssignmentIndex", ["used_names", "used_partners", "by_name"])
+
+
+def index_assignments(assignments):
+    """Build the used-name/used-partner sets and a by-name lookup in one pass."""
+    used_names = set()
+    used_partners = set()
+    by_name = {}
+    for item in assignments:
+        name = item["name"]
+        used_names.add(name)
+        by_name[name] = item
+        partner = item.get("partner")
+        if partner is not None:
+            used_partners.add(partner)
+    return AssignmentIndex(used_names, used_partners, by_name)
 
 
-def get_available_names(participants, assignments):
-    """Return names that have not been used yet."""
-    used_names = {item["name"] for item in assignments}
+def get_available_names(participants, index):
+    """Return names that have not been used yet, in participants order."""
+    used_names = index.used_names
     return [name for name in participants if name not in used_names]
 
 
-def get_partner_candidates(selected_name, participants, assignments):
+def get_partner_candidates(selected_name, participants, index):
     """Return names that can still be assigned as partners (one-time use)."""
-    used_partners = {
-        item["partner"]
-        for item in assignments
-        if item.get("partner") and not item["partner"].startswith("SIN PAREJA")
-    }
+    used_partners = index.used_partners
     return [
         name
         for name in participants
@@ -72,46 +411,208 @@ def get_partner_candidates(selected_name, participants, assignments):
     ]
 
 
-def export_to_excel():
-    """Export all assignments to an Excel file using pandas."""
-    assignments = load_assignments()
-    if not assignments:
-        # Create an empty DataFrame with the expected columns so the file always exists.
-        df = pd.DataFrame(columns=["FechaHora", "Nombre", "Pareja"])
-    else:
-        df = pd.DataFrame(
-            [
-                {
-                    "FechaHora": item.get("timestamp"),
-                    "Nombre": item.get("name"),
-                    "Pareja": item.get("partner"),
-                }
-                for item in assignments
-            ]
+def load_assignment_state():
+    """Return participants plus derived assignment data, memoized per file version.
+
+    The returned entry is shared between requests and must not be mutated.
+    """
+    participants, participants_set, participants_mtime = _maybe_refresh_participants()
+    if not os.path.exists(ASSIGNMENTS_FILE):
+        load_assignments()
+
+    with _cache_lock:
+        cache = _refresh_assignments_cache()
+        # Within one generation the records only change by appends (offset).
+        version = (participants_mtime, cache["generation"], cache["offset"])
+        if _derived_cache["version"] != version:
+            assignment_index = index_assignments(cache["data"])
+            available_names = get_available_names(participants, assignment_index)
+            _derived_cache["version"] = version
+            _derived_cache["state"] = {
+                "participants_set": participants_set,
+                "index": assignment_index,
+                "available_names": available_names,
+                "available_names_sorted": sorted(available_names),
+            }
+        return participants, _derived_cache["state"]
+
+
+def _xlsx_row(values):
+    """Return a <row> element holding each value as an inline string cell."""
+    cells = [
+        "<c/>"
+        if value is None
+        else '<c t="inlineStr"><is><t xml:space="preserve">{}</t></is></c>'.format(
+            xml_escape(str(value))
         )
-    df.to_excel(EXCEL_FILE, index=False, engine="openpyxl")
+        for value in values
+    ]
+    return "<row>" + "".join(cells) + "</row>"
+
+
+def _export_to_excel_xml(assignments, file):
+    """Emit the .xlsx parts directly; the schema is three fixed string columns."""
+    with zipfile.ZipFile(file, "w", zipfile.ZIP_DEFLATED) as archive:
+        for part_name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(part_name, content)
+        with archive.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            # The header row is always written so the file is valid even with no data.
+            rows = [_XLSX_SHEET_HEADER, _xlsx_row(EXCEL_COLUMNS)]
+            for item in assignments:
+                rows.append(
+                    _xlsx_row((item.get("timestamp"), item.get("name"), _partner_label(item)))
+                )
+                # Stream in bounded chunks so memory stays flat however many rows.
+                if len(rows) >= _XLSX_ROWS_PER_WRITE:
+                    sheet.write("".join(rows).encode("utf-8"))
+                    rows.clear()
+            rows.append(_XLSX_SHEET_FOOTER)
+            sheet.write("".join(rows).encode("utf-8"))
+
+
+def _export_to_excel_openpyxl(assignments, file):
+    """Fallback export through an openpyxl write-only workbook."""
+    # Imported here so the default path never loads openpyxl at startup.
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Asignaciones")
+    sheet.append(EXCEL_COLUMNS)
+    for item in assignments:
+        sheet.append((item.get("timestamp"), item.get("name"), _partner_label(item)))
+    workbook.save(file)
+
+
+def export_to_excel():
+    """Export all assignments to an Excel file."""
+    assignments = load_assignments(copy=False)
+    # Swap the finished file in so downloads never see a half-written export.
+    with _atomic_write(EXCEL_FILE) as file:
+        if EXCEL_ENGINE == "openpyxl":
+            _export_to_excel_openpyxl(assignments, file)
+        else:
+            _export_to_excel_xml(assignments, file)
+
+
+def ensure_excel_export():
+    """Regenerate the Excel file only if assignments changed since the last export."""
+    load_assignments(copy=False)  # Makes sure the assignments file exists.
+    # Export and stamp must not interleave with another download's, or an old
+    # export could end up under a newer stamp.
+    with _file_lock(EXCEL_LOCK_FILE):
+        # Taken before exporting, so a concurrent append only makes the stamp stale.
+        # The size matters too: two appends can share one mtime tick.
+        stat = os.stat(ASSIGNMENTS_FILE)
+        assignments_stamp = "{} {} {}".format(stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if os.path.exists(EXCEL_FILE) and os.path.exists(EXCEL_STAMP_FILE):
+            with open(EXCEL_STAMP_FILE, "r", encoding="utf-8") as file:
+                if file.read().strip() == assignments_stamp:
+                    return
+        export_to_excel()
+        with _atomic_write(EXCEL_STAMP_FILE) as file:
+            file.write(assignments_stamp.encode("utf-8"))
+
+
+def _apply_assignment_ops(ops):
+    """Apply admin ops ("delete", "update", "upsert") and persist once.
+
+    "update" is the admin override used by the single-op endpoint: it edits an
+    existing assignment and may set any partner. "upsert" also creates missing
+    assignments, so it only accepts participants and partners nobody else has.
+    Any invalid op aborts the request before anything is written.
+    """
+    participants_set = _maybe_refresh_participants()[1]
+    with _assignments_file_lock():
+        assignments_by_name = index_assignments(load_assignments()).by_name
+        with _cache_lock:
+            unparsed = _assignments_cache["offset"] < os.path.getsize(ASSIGNMENTS_FILE)
+        if unparsed:
+            # Compacting now would silently drop the bytes we could not parse.
+            abort(
+                409,
+                description="El archivo de asignaciones tiene una línea incompleta; "
+                "revísalo antes de editar.",
+            )
+        # partner -> names holding it, kept current as ops run; "update" may
+        # have left the same partner on more than one record.
+        partner_holders = {}
+        for holder, item in assignments_by_name.items():
+            if item.get("partner") is not None:
+                partner_holders.setdefault(item["partner"], set()).add(holder)
+        results = []
+        for op in ops:
+            if not isinstance(op, dict):
+                abort(400, description="Cada operación debe ser un objeto JSON.")
+            kind = op.get("op")
+            name = op.get("name", "")
+            if not isinstance(name, str):
+                abort(400, description="El campo 'name' debe ser texto.")
+            name = name.strip()
+            if not name:
+                abort(400, description="El campo 'name' es obligatorio.")
+
+            if kind == "delete":
+                removed = assignments_by_name.pop(name, None)
+                if removed is None:
+                    abort(404, description="No existe una asignación para ese nombre.")
+                if removed.get("partner") is not None:
+                    partner_holders[removed["partner"]].discard(name)
+                results.append({"status": "eliminado", "name": name})
+                continue
+
+            if kind not in ("update", "upsert"):
+                abort(400, description="Operación no soportada: {}.".format(kind))
+            partner = op.get("partner", "")
+            if not isinstance(partner, str):
+                abort(400, description="El campo 'partner' debe ser texto.")
+            partner = partner.strip()
+            if not partner:
+                abort(400, description="El campo 'partner' es obligatorio para actualizar.")
+            if kind == "upsert":
+                if name not in participants_set or partner not in participants_set:
+                    abort(400, description="El nombre o la pareja no es un participante.")
+                if partner == name or partner_holders.get(partner, set()) - {name}:
+                    abort(409, description="Esa pareja ya está asignada.")
+
+            assignment = assignments_by_name.get(name)
+            if not assignment:
+                if kind == "update":
+                    abort(404, description="No existe una asignación para ese nombre.")
+                assignment = assignments_by_name[name] = {"name": name}
+
+            if assignment.get("partner") is not None:
+                partner_holders[assignment["partner"]].discard(name)
+            partner_holders.setdefault(partner, set()).add(name)
+            assignment["partner"] = partner
+            assignment["timestamp"] = datetime.now().replace(microsecond=0).isoformat()
+            # Snapshot: later ops in the same batch may change this record again.
+            results.append({"status": "actualizado", "assignment": dict(assignment)})
+
+        save_assignments(list(assignments_by_name.values()))
+    return results
 
 
 def _get_json_payload():
-    """Return parsed JSON payload or abort if missing."""
+    """Return parsed JSON object payload or abort if missing or not an object."""
     data = request.get_json(silent=True)
-    if data is None:
-        abort(400, description="Se requiere un cuerpo JSON.")
+    if not isinstance(data, dict):
+        abort(400, description="Se requiere un cuerpo JSON con un objeto.")
     return data
 
 
 def _require_password(provided):
     """Abort the request if the password is incorrect."""
-    if provided != ADMIN_PASSWORD:
+    # compare_digest takes the same time wherever the first mismatch is.
+    if not isinstance(provided, str) or not hmac.compare_digest(
+        provided.encode("utf-8"), _ADMIN_PASSWORD_BYTES
+    ):
         abort(401, description="Contraseña inválida.")
 
 
 @app.route("/", methods=["GET"])
 def index():
-    participants = load_participants()
-    assignments = load_assignments()
-    available_names = get_available_names(participants, assignments)
-    return render_template("index.html", available_names=sorted(available_names))
+    _, state = load_assignment_state()
+    return render_template("index.html", available_names=state["available_names_sorted"])
 
 
 @app.route("/asignar", methods=["POST"])
@@ -122,43 +623,36 @@ def asignar():
         flash("Debes seleccionar tu nombre antes de continuar.")
         return redirect(url_for("index"))
 
-    participants = load_participants()
-    if selected_name not in participants:
-        flash("El nombre seleccionado no es válido.")
-        return redirect(url_for("index"))
-
-    assignments = load_assignments()
-    roulette_names = get_partner_candidates(selected_name, participants, assignments)
-    existing_assignment = next((a for a in assignments if a["name"] == selected_name), None)
-    if existing_assignment:
-        partner = existing_assignment["partner"]
-        return render_template(
-            "result.html",
-            name=selected_name,
-            partner=partner,
-            roulette_names=roulette_names,
-            participants=participants,
-        )
-
-    candidates = roulette_names
-    if not candidates:
-        partner = "SIN PAREJA (no hay más participantes disponibles)"
-    else:
-        partner = random.choice(candidates)
-
-    assignment = {
-        "name": selected_name,
-        "partner": partner,
-        "timestamp": datetime.now().replace(microsecond=0).isoformat(),
-    }
-    assignments.append(assignment)
-    save_assignments(assignments)
-    export_to_excel()
+    # Held across workers so two people cannot draw the same partner.
+    with _assignments_file_lock():
+        participants, state = load_assignment_state()
+        if selected_name not in state["participants_set"]:
+            flash("El nombre seleccionado no es válido.")
+            return redirect(url_for("index"))
+
+        roulette_names = get_partner_candidates(selected_name, participants, state["index"])
+        existing_assignment = state["index"].by_name.get(selected_name)
+        if existing_assignment:
+            partner = existing_assignment["partner"]
+        else:
+            candidates = roulette_names
+            if not candidates:
+                partner = None
+            else:
+                partner = random.choice(candidates)
+
+            assignment = {
+                "name": selected_name,
+                "partner": partner,
+                "timestamp": datetime.now().replace(microsecond=0).isoformat(),
+            }
+            append_assignment(assignment)
 
     return render_template(
         "result.html",
         name=selected_name,
         partner=partner,
+        no_partner_label=NO_PARTNER_LABEL,
         roulette_names=roulette_names,
         participants=participants,
     )
@@ -176,39 +670,31 @@ def admin_assignments():
     if request.method == "GET":
         password = request.args.get("password")
         _require_password(password)
-        assignments = load_assignments()
+        assignments = load_assignments(copy=False)
         return jsonify({"assignments": assignments})
 
     data = _get_json_payload()
     password = data.get("password")
     _require_password(password)
 
-    name = data.get("name", "").strip()
-    if not name:
-        abort(400, description="El campo 'name' es obligatorio.")
-
-    assignments = load_assignments()
     if request.method == "DELETE":
-        new_assignments = [item for item in assignments if item["name"] != name]
-        if len(new_assignments) == len(assignments):
-            abort(404, description="No existe una asignación para ese nombre.")
-        save_assignments(new_assignments)
-        export_to_excel()
-        return jsonify({"status": "eliminado", "name": name})
+        op = {"op": "delete", "name": data.get("name", "")}
+    else:
+        op = {"op": "update", "name": data.get("name", ""), "partner": data.get("partner", "")}
+    return jsonify(_apply_assignment_ops([op])[0])
 
-    partner = data.get("partner", "").strip()
-    if not partner:
-        abort(400, description="El campo 'partner' es obligatorio para actualizar.")
 
-    assignment = next((item for item in assignments if item["name"] == name), None)
-    if not assignment:
-        abort(404, description="No existe una asignación para ese nombre.")
+@app.route("/admin/asignaciones/batch", methods=["POST"])
+def admin_assignments_batch():
+    """Aplicar varias eliminaciones/actualizaciones y guardar una sola vez."""
+    data = _get_json_payload()
+    password = data.get("password")
+    _require_password(password)
 
-    assignment["partner"] = partner
-    assignment["timestamp"] = datetime.now().replace(microsecond=0).isoformat()
-    save_assignments(assignments)
-    export_to_excel()
-    return jsonify({"status": "actualizado", "assignment": assignment})
+    ops = data.get("ops")
+    if not isinstance(ops, list) or not ops:
+        abort(400, description="El campo 'ops' debe ser una lista no vacía.")
+    return jsonify({"status": "ok", "results": _apply_assignment_ops(ops)})
 
 
 @app.route("/admin/asignaciones/excel", methods=["GET"])
@@ -216,17 +702,22 @@ def admin_download_excel():
     """Descargar el archivo Excel con todas las asignaciones."""
     password = request.args.get("password")
     _require_password(password)
-    if not os.path.exists(EXCEL_FILE):
-        export_to_excel()
-    return send_file(
-        EXCEL_FILE,
+    ensure_excel_export()
+    response = send_from_directory(
+        DATA_DIR,
+        os.path.basename(EXCEL_FILE),
         mimetype=(
             "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
         ),
         as_attachment=True,
         download_name="asignaciones.xlsx",
+        conditional=True,
     )
+    # Always revalidate: the export changes as soon as an assignment is made.
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Local development only; production runs gunicorn against wsgi:app.
+    app.run(host="0.0.0.0", port=5000, debug=os.environ.get("FLASK_DEBUG") == "1")
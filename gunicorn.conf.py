@@ -0,0 +1,6 @@
+import multiprocessing
+import os
+
+# Render and Heroku set WEB_CONCURRENCY; otherwise use one worker per core.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+preload_app = True
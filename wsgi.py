@@ -0,0 +1,8 @@
+"""WSGI entrypoint for gunicorn (see gunicorn.conf.py)."""
+from app import app, load_assignment_state
+
+# With preload_app the master loads the data once and workers inherit the
+# warm caches; each worker still re-checks file mtimes on every request.
+load_assignment_state()
+
+__all__ = ["app"]